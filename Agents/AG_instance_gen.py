@@ -8,8 +8,20 @@ from Agents.instance_gen import generate_vrp_instance, save_instance, print_inst
 from Agents.shared_context import get_context
 from Agents.guardrails import InstanceParameterGuardrail, format_validation_result
 from azure import model
+from Agents import json_utils
+import io
 import json
 
+# Expected types for the scalar instance parameters; O(1) dispatch for
+# modify_instance_parameter instead of an isinstance chain per call
+_PARAM_TYPES = {
+    "n_vertices": int,
+    "n_customers": int,
+    "n_vehicles": int,
+    "vehicle_capacity": int,
+    "seed": int,
+}
+
 
 @function_tool
 def create_vrp_instance(n_customers: int = 9, seed: int = 42) -> str:
@@ -45,10 +57,10 @@ def create_vrp_instance(n_customers: int = 9, seed: int = 42) -> str:
     ctx.set_instance(instance, name=f"vrp_{n_customers}c_seed{seed}")
     
     # Build response with any warnings
-    response = json.dumps(instance, indent=2)
+    response = json_utils.dumps(instance)
     
     if validation.warnings:
-        warnings = "\n".join(f"⚠️ {w}" for w in validation.warnings)
+        warnings = "\n".join([f"⚠️ {w}" for w in validation.warnings])
         response = f"{warnings}\n\n{response}"
     
     return response
@@ -88,28 +100,37 @@ def get_instance_summary(instance_json: str) -> str:
     Returns:
         Formatted summary string.
     """
-    instance = json.loads(instance_json)
-    
-    summary = []
-    summary.append("=" * 50)
-    summary.append("VRP Instance with Time Windows")
-    summary.append("=" * 50)
-    summary.append(f"Number of vertices: {instance['n_vertices']}")
-    summary.append(f"Number of customers: {instance['n_customers']}")
-    summary.append(f"Number of vehicles: {instance['n_vehicles']}")
-    summary.append(f"Vehicle capacity: {instance['vehicle_capacity']}")
-    summary.append("\nVertices:")
-    summary.append("-" * 50)
-    summary.append(f"{'ID':<8} {'Coord':<20} {'TW':<15} {'Service':<8} {'Demand':<6}")
-    summary.append("-" * 50)
-    
+    instance = json_utils.loads_cached(instance_json)
+
+    # Write into a single StringIO buffer instead of list.append + join
+    buf = io.StringIO()
+    sep = "=" * 50
+    buf.write(
+        f"{sep}\n"
+        "VRP Instance with Time Windows\n"
+        f"{sep}\n"
+        f"Number of vertices: {instance['n_vertices']}\n"
+        f"Number of customers: {instance['n_customers']}\n"
+        f"Number of vehicles: {instance['n_vehicles']}\n"
+        f"Vehicle capacity: {instance['vehicle_capacity']}\n"
+        "\nVertices:\n"
+        f"{'-' * 50}\n"
+        f"{'ID':<8} {'Coord':<20} {'TW':<15} {'Service':<8} {'Demand':<6}\n"
+        f"{'-' * 50}"
+    )
+
+    coordinates = instance['coordinates']
+    time_windows = instance['time_windows']
+    service_times = instance['service_times']
+    demands = instance['demands']
+
     for i in range(instance['n_vertices']):
-        coord = f"({instance['coordinates'][i][0]:.1f}, {instance['coordinates'][i][1]:.1f})"
-        tw = f"[{instance['time_windows'][i][0]}, {instance['time_windows'][i][1]}]"
+        coord = f"({coordinates[i][0]:.1f}, {coordinates[i][1]:.1f})"
+        tw = f"[{time_windows[i][0]}, {time_windows[i][1]}]"
         vertex_type = "Depot" if i == 0 else f"Cust {i}"
-        summary.append(f"{vertex_type:<8} {coord:<20} {tw:<15} {instance['service_times'][i]:<8} {instance['demands'][i]:<6}")
-    
-    return "\n".join(summary)
+        buf.write(f"\n{vertex_type:<8} {coord:<20} {tw:<15} {service_times[i]:<8} {demands[i]:<6}")
+
+    return buf.getvalue()
 
 
 @function_tool
@@ -125,21 +146,22 @@ def modify_instance_parameter(instance_json: str, parameter: str, value: str) ->
     Returns:
         Modified instance as JSON string.
     """
-    instance = json.loads(instance_json)
+    # Copy the cached parse before mutating it
+    instance = dict(json_utils.loads_cached(instance_json))
     
     if parameter in instance:
-        # Try to convert to appropriate type
+        # Convert via the dispatch table, falling back to the current
+        # value's type for parameters not listed there
+        converter = _PARAM_TYPES.get(parameter)
+        if converter is None and isinstance(instance[parameter], (int, float)):
+            converter = type(instance[parameter])
+
         try:
-            if isinstance(instance[parameter], int):
-                instance[parameter] = int(value)
-            elif isinstance(instance[parameter], float):
-                instance[parameter] = float(value)
-            else:
-                instance[parameter] = value
+            instance[parameter] = converter(value) if converter else value
         except ValueError:
             instance[parameter] = value
-        
-        return json.dumps(instance, indent=2)
+
+        return json_utils.dumps(instance)
     else:
         return f"Error: Parameter '{parameter}' not found in instance. Available: {list(instance.keys())}"
 
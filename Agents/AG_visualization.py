@@ -6,75 +6,157 @@ Provides visualization capabilities for VRP instances and solutions.
 from agents import Agent, function_tool
 from azure import model
 from Agents.shared_context import get_context
+from Agents import json_utils
+from contextlib import contextmanager
+import importlib.util
 import json
 import base64
+import numpy as np
+import threading
 from io import BytesIO
 
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # Non-interactive backend
-    import matplotlib.pyplot as plt
-    import matplotlib.patches as mpatches
-    HAS_MATPLOTLIB = True
-except ImportError:
-    HAS_MATPLOTLIB = False
+HAS_MATPLOTLIB = importlib.util.find_spec("matplotlib") is not None
+
+# Matplotlib state, populated by _ensure_mpl() on first render. A cold
+# matplotlib import costs ~300ms; agents that never visualize (or only
+# list tools) should not pay it at module load.
+_MPL_LOCK = threading.Lock()
+_mpl_ready = False
+_Figure = None
+_FigureCanvasAgg = None
+_ROUTE_COLORS = None
+_GANTT_COLORS = None
+
+
+def _ensure_mpl():
+    """Import matplotlib and build the cached palettes on first use."""
+    global _mpl_ready, _Figure, _FigureCanvasAgg, _ROUTE_COLORS, _GANTT_COLORS
+    if _mpl_ready:
+        return
+    with _MPL_LOCK:
+        if _mpl_ready:
+            return
+        import matplotlib
+        matplotlib.use('Agg')  # Non-interactive backend
+        from matplotlib import cm
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        _Figure = Figure
+        _FigureCanvasAgg = FigureCanvasAgg
+        # Precomputed qualitative palettes; colormap calls allocate a
+        # fresh RGBA array per invocation, so look them up once.
+        _ROUTE_COLORS = cm.Set1(range(20))
+        _GANTT_COLORS = cm.Set2(range(20))
+        _mpl_ready = True
+
+
+def _route_palette(palette, n_routes):
+    """Slice n_routes colors out of a precomputed palette, cycling if needed."""
+    return palette[np.arange(n_routes) % len(palette)]
+
+
+# Single reusable figure: axes/spines/ticks construction dominates the
+# cost of small agent-driven plots, so keep one Figure alive and clear
+# it between renders. _shared_figure holds the lock for the duration of
+# its `with` block, so it is released on every exit path -- including
+# exceptions raised mid-render by bad agent-supplied data.
+_FIG_LOCK = threading.Lock()
+_FIG = None
+
+
+@contextmanager
+def _shared_figure(figsize):
+    """
+    Yield the shared Figure + a fresh Axes, resized for this render.
+    Holds the figure lock for the body of the `with` block.
+    """
+    global _FIG
+    _ensure_mpl()
+    with _FIG_LOCK:
+        if _FIG is None:
+            _FIG = _Figure(figsize=figsize)
+            _FigureCanvasAgg(_FIG)
+        else:
+            _FIG.set_size_inches(*figsize)
+        _FIG.clear()
+        ax = _FIG.add_subplot(1, 1, 1)
+        yield _FIG, ax
+
+
+def _fig_to_base64(fig) -> str:
+    """
+    Render the shared figure to PNG and return base64. Call inside a
+    _shared_figure block, while the figure lock is still held.
+    Uses a single render pass (tight_layout instead of the double-render
+    bbox_inches='tight') and a zero-copy buffer for encoding.
+    """
+    fig.tight_layout()
+    buf = BytesIO()
+    # compress_level=1: ~2-3x faster PNG encode than the zlib
+    # default of 6, at ~10% larger output - a good trade for
+    # inline chat images that are rendered once and discarded
+    fig.canvas.print_png(buf, pil_kwargs={'compress_level': 1})
+    return base64.b64encode(buf.getbuffer()).decode('ascii')
 
 
 @function_tool
 def visualize_instance(instance_json: str = None) -> str:
     """
     Create a visualization of the VRP instance showing customer locations and depot.
-    
+
     Args:
         instance_json: Optional JSON string of instance. If not provided, uses context.
-    
+
     Returns:
         Base64 encoded PNG image or text description if matplotlib unavailable.
     """
     if not HAS_MATPLOTLIB:
         return "Matplotlib not available. Install with: pip install matplotlib"
-    
+
     # Get instance from context if not provided
     if instance_json is None:
         ctx = get_context()
         if not ctx.has_instance():
             return "No instance available. Please generate or load an instance first."
         instance = ctx.get_instance()
+        coords_arr = ctx.get_coords_np()
     else:
-        instance = json.loads(instance_json)
-    
+        instance = json_utils.loads_cached(instance_json)
+        coords_arr = np.asarray(instance['coordinates'], dtype=np.float32)
+
     coords = instance['coordinates']
     tw = instance['time_windows']
     demands = instance['demands']
     n = len(coords)
-    
-    fig, ax = plt.subplots(1, 1, figsize=(10, 8))
-    
-    # Plot depot
-    ax.scatter(coords[0][0], coords[0][1], c='red', s=200, marker='s', 
-               label='Depot', zorder=5, edgecolors='black', linewidth=2)
-    
-    # Plot customers
-    for i in range(1, n):
-        ax.scatter(coords[i][0], coords[i][1], c='blue', s=100 + demands[i]*20, 
+
+    with _shared_figure(figsize=(10, 8)) as (fig, ax):
+        # Plot depot
+        ax.scatter(coords[0][0], coords[0][1], c='red', s=200, marker='s',
+                   label='Depot', zorder=5, edgecolors='black', linewidth=2)
+
+        # Plot all customers with a single vectorized scatter call
+        demands_arr = np.asarray(demands)
+        ax.scatter(coords_arr[1:, 0], coords_arr[1:, 1], c='blue',
+                   s=100 + demands_arr[1:] * 20,
                    marker='o', zorder=4, edgecolors='black', alpha=0.7)
-        ax.annotate(f'{i}\nTW:{tw[i][0]}-{tw[i][1]}\nD:{demands[i]}', 
-                    (coords[i][0], coords[i][1]), 
-                    textcoords="offset points", xytext=(5, 5), fontsize=8)
-    
-    ax.set_xlabel('X Coordinate')
-    ax.set_ylabel('Y Coordinate')
-    ax.set_title(f'VRP Instance: {n-1} customers, {instance["n_vehicles"]} vehicles')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    
-    # Save to base64
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
+
+        # Annotations are per-artist in Matplotlib; precompute the label
+        # strings and build the shared kwargs dict once instead of per call
+        labels = [f'{i}\nTW:{tw[i][0]}-{tw[i][1]}\nD:{demands[i]}' for i in range(1, n)]
+        annotate_kwargs = dict(textcoords="offset points", xytext=(5, 5), fontsize=8)
+        for label, (cx, cy) in zip(labels, coords_arr[1:]):
+            ax.annotate(label, (cx, cy), **annotate_kwargs)
+
+        ax.set_xlabel('X Coordinate')
+        ax.set_ylabel('Y Coordinate')
+        ax.set_title(f'VRP Instance: {n-1} customers, {instance["n_vehicles"]} vehicles')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+
+        # Save to base64
+        img_base64 = _fig_to_base64(fig)
+
     return f"![VRP Instance](data:image/png;base64,{img_base64})"
 
 
@@ -82,159 +164,161 @@ def visualize_instance(instance_json: str = None) -> str:
 def visualize_solution(solution_json: str = None, instance_json: str = None) -> str:
     """
     Create a visualization of the VRP solution showing routes.
-    
+
     Args:
         solution_json: Optional JSON string of solution.
         instance_json: Optional JSON string of instance.
-    
+
     Returns:
         Base64 encoded PNG image or text description.
     """
     if not HAS_MATPLOTLIB:
         return "Matplotlib not available. Install with: pip install matplotlib"
-    
+
     ctx = get_context()
-    
+
     # Get instance
     if instance_json is None:
         if not ctx.has_instance():
             return "No instance available."
         instance = ctx.get_instance()
+        coords_arr = ctx.get_coords_np()
     else:
-        instance = json.loads(instance_json)
-    
+        instance = json_utils.loads_cached(instance_json)
+        coords_arr = np.asarray(instance['coordinates'], dtype=np.float32)
+
     # Get solution
     if solution_json is None:
         if not ctx.has_solution():
             return "No solution available. Please solve the instance first."
         solution = ctx.get_solution()
     else:
-        solution = json.loads(solution_json)
-    
+        solution = json_utils.loads_cached(solution_json)
+
     coords = instance['coordinates']
     routes = solution.get('routes', [])
-    
+
     if not routes:
         return "No routes in solution."
-    
-    fig, ax = plt.subplots(1, 1, figsize=(12, 9))
-    
-    # Color palette for routes
-    colors = plt.cm.Set1(range(len(routes)))
-    
-    # Plot routes
-    for idx, route in enumerate(routes):
-        route_coords = [coords[v] for v in route]
-        xs = [c[0] for c in route_coords]
-        ys = [c[1] for c in route_coords]
-        
-        ax.plot(xs, ys, c=colors[idx], linewidth=2, alpha=0.7, 
-                label=f'Route {idx+1}', marker='o', markersize=8)
-        
-        # Add arrows for direction
-        for i in range(len(route) - 1):
-            dx = coords[route[i+1]][0] - coords[route[i]][0]
-            dy = coords[route[i+1]][1] - coords[route[i]][1]
-            ax.annotate('', xy=(coords[route[i+1]][0], coords[route[i+1]][1]),
-                        xytext=(coords[route[i]][0], coords[route[i]][1]),
-                        arrowprops=dict(arrowstyle='->', color=colors[idx], lw=1.5))
-    
-    # Plot depot
-    ax.scatter(coords[0][0], coords[0][1], c='red', s=300, marker='s', 
-               zorder=10, edgecolors='black', linewidth=3, label='Depot')
-    
-    # Annotate customers
-    for i in range(1, len(coords)):
-        ax.annotate(str(i), (coords[i][0], coords[i][1]), 
-                    textcoords="offset points", xytext=(5, 5), fontsize=10, fontweight='bold')
-    
-    ax.set_xlabel('X Coordinate')
-    ax.set_ylabel('Y Coordinate')
-    total_cost = solution.get('total_cost', 0)
-    ax.set_title(f'VRP Solution: {len(routes)} routes, Total Cost: {total_cost:.2f}')
-    ax.legend(loc='upper right')
-    ax.grid(True, alpha=0.3)
-    
-    # Save to base64
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
+
+    with _shared_figure(figsize=(12, 9)) as (fig, ax):
+        # Color palette for routes
+        colors = _route_palette(_ROUTE_COLORS, len(routes))
+
+        # Plot routes, accumulating direction arrows for a single quiver call
+        arrow_starts = []
+        arrow_deltas = []
+        arrow_colors = []
+
+        for idx, route in enumerate(routes):
+            route_coords = coords_arr[route]
+
+            ax.plot(route_coords[:, 0], route_coords[:, 1], c=colors[idx],
+                    linewidth=2, alpha=0.7,
+                    label=f'Route {idx+1}', marker='o', markersize=8)
+
+            # Vectorized edge starts/deltas for this route's direction arrows
+            arrow_starts.append(route_coords[:-1])
+            arrow_deltas.append(route_coords[1:] - route_coords[:-1])
+            arrow_colors.extend([colors[idx]] * (len(route) - 1))
+
+        starts = np.concatenate(arrow_starts)
+        deltas = np.concatenate(arrow_deltas)
+        ax.quiver(starts[:, 0], starts[:, 1], deltas[:, 0], deltas[:, 1],
+                  color=arrow_colors, angles='xy', scale_units='xy', scale=1,
+                  width=0.004, alpha=0.7, zorder=3)
+
+        # Plot depot
+        ax.scatter(coords[0][0], coords[0][1], c='red', s=300, marker='s',
+                   zorder=10, edgecolors='black', linewidth=3, label='Depot')
+
+        # Annotate customers (shared kwargs built once)
+        annotate_kwargs = dict(textcoords="offset points", xytext=(5, 5),
+                               fontsize=10, fontweight='bold')
+        for i in range(1, len(coords)):
+            ax.annotate(str(i), (coords[i][0], coords[i][1]), **annotate_kwargs)
+
+        ax.set_xlabel('X Coordinate')
+        ax.set_ylabel('Y Coordinate')
+        total_cost = solution.get('total_cost', 0)
+        ax.set_title(f'VRP Solution: {len(routes)} routes, Total Cost: {total_cost:.2f}')
+        ax.legend(loc='upper right')
+        ax.grid(True, alpha=0.3)
+
+        # Save to base64
+        img_base64 = _fig_to_base64(fig)
+
     return f"![VRP Solution](data:image/png;base64,{img_base64})"
 
 
-@function_tool  
+@function_tool
 def visualize_gantt_schedule(solution_json: str = None, instance_json: str = None) -> str:
     """
     Create a Gantt chart showing the time schedule for each route.
-    
+
     Args:
         solution_json: Optional JSON string of solution.
         instance_json: Optional JSON string of instance.
-    
+
     Returns:
         Base64 encoded PNG image.
     """
     if not HAS_MATPLOTLIB:
         return "Matplotlib not available."
-    
+
     ctx = get_context()
-    
+
     if instance_json is None:
         if not ctx.has_instance():
             return "No instance available."
         instance = ctx.get_instance()
     else:
-        instance = json.loads(instance_json)
-    
+        instance = json_utils.loads_cached(instance_json)
+
     if solution_json is None:
         if not ctx.has_solution():
             return "No solution available."
         solution = ctx.get_solution()
     else:
-        solution = json.loads(solution_json)
-    
+        solution = json_utils.loads_cached(solution_json)
+
     routes = solution.get('routes', [])
     schedules = solution.get('schedules', [])
     tw = instance['time_windows']
-    
+
     if not schedules:
         return "No schedule information in solution."
-    
-    fig, ax = plt.subplots(1, 1, figsize=(14, 6))
-    
-    colors = plt.cm.Set2(range(len(routes)))
-    
-    for idx, (route, schedule) in enumerate(zip(routes, schedules)):
-        y = idx
-        
-        for i, (vertex, arrival) in enumerate(zip(route[1:-1], schedule[1:-1])):
-            # Draw time window
-            ax.barh(y, tw[vertex][1] - tw[vertex][0], left=tw[vertex][0], 
-                    height=0.3, color='lightgray', alpha=0.5)
-            
-            # Draw service
-            service_time = instance['service_times'][vertex]
-            ax.barh(y, service_time, left=arrival, height=0.6, 
-                    color=colors[idx], edgecolor='black')
-            
-            ax.text(arrival + service_time/2, y, str(vertex), 
-                    ha='center', va='center', fontsize=8)
-    
-    ax.set_yticks(range(len(routes)))
-    ax.set_yticklabels([f'Route {i+1}' for i in range(len(routes))])
-    ax.set_xlabel('Time')
-    ax.set_title('Route Schedules (Gantt Chart)')
-    ax.grid(True, axis='x', alpha=0.3)
-    
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
+
+    with _shared_figure(figsize=(14, 6)) as (fig, ax):
+        colors = _route_palette(_GANTT_COLORS, len(routes))
+
+        service_times = instance['service_times']
+
+        for idx, (route, schedule) in enumerate(zip(routes, schedules)):
+            y = idx
+            stops = list(zip(route[1:-1], schedule[1:-1]))
+
+            # Draw all time windows and all service bars for this route in
+            # two broken_barh calls instead of 2 barh calls per stop
+            tw_bars = [(tw[v][0], tw[v][1] - tw[v][0]) for v, _ in stops]
+            svc_bars = [(arrival, service_times[v]) for v, arrival in stops]
+
+            ax.broken_barh(tw_bars, (y - 0.15, 0.3), color='lightgray', alpha=0.5)
+            ax.broken_barh(svc_bars, (y - 0.3, 0.6), facecolors=colors[idx],
+                           edgecolor='black')
+
+            for vertex, arrival in stops:
+                ax.text(arrival + service_times[vertex] / 2, y, str(vertex),
+                        ha='center', va='center', fontsize=8)
+
+        ax.set_yticks(range(len(routes)))
+        ax.set_yticklabels([f'Route {i+1}' for i in range(len(routes))])
+        ax.set_xlabel('Time')
+        ax.set_title('Route Schedules (Gantt Chart)')
+        ax.grid(True, axis='x', alpha=0.3)
+
+        img_base64 = _fig_to_base64(fig)
+
     return f"![Gantt Schedule](data:image/png;base64,{img_base64})"
 
 
@@ -242,7 +326,7 @@ def visualize_gantt_schedule(solution_json: str = None, instance_json: str = Non
 def get_context_status() -> str:
     """
     Get the current status of the shared OR context.
-    
+
     Returns:
         Status string showing loaded instance and solution info.
     """
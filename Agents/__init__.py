@@ -16,6 +16,7 @@ from Agents.shared_context import (
 from Agents.guardrails import (
     topic_guardrail,
     safety_guardrail,
+    combined_input_guardrail,
     professional_output_guardrail,
     InstanceParameterGuardrail,
     SolverGuardrail,
@@ -37,6 +38,7 @@ __all__ = [
     # Guardrails
     "topic_guardrail",
     "safety_guardrail",
+    "combined_input_guardrail",
     "professional_output_guardrail",
     "InstanceParameterGuardrail",
     "SolverGuardrail",
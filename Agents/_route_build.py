@@ -0,0 +1,74 @@
+"""
+Route reconstruction helper for the VRPTW solver tools.
+
+The pointer chase from the depot's outgoing arcs is kept in a small
+array-only kernel so it can be JIT-compiled with Numba when the package
+is installed; without Numba the plain-Python version runs unchanged.
+Numba is an optional accelerator, not a dependency.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in: return the function undecorated."""
+        if args and callable(args[0]):
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
+
+
+@njit(cache=True)
+def _chase_routes(succ, starts, max_len):
+    """
+    Follow successor pointers from each depot start back to the depot.
+
+    Args:
+        succ: int64 array where succ[i] is the vertex visited after i
+        starts: int64 array of first customers on each route
+        max_len: row width for the output (n_vertices + 2 covers any route)
+
+    Returns:
+        int64 matrix with one padded route per row; unused cells are -1.
+    """
+    routes = -np.ones((starts.shape[0], max_len), dtype=np.int64)
+    for k in range(starts.shape[0]):
+        routes[k, 0] = 0
+        v = starts[k]
+        pos = 1
+        while v != 0:
+            routes[k, pos] = v
+            v = succ[v]
+            pos += 1
+        routes[k, pos] = 0
+    return routes
+
+
+def reconstruct_routes(succ, starts, n_vertices):
+    """
+    Build route lists from a successor map.
+
+    Args:
+        succ: successor per vertex (list or array; -1 for unused vertices)
+        starts: first customer of each route (depot's outgoing arcs)
+        n_vertices: number of vertices in the instance
+
+    Returns:
+        List of routes, each a list of vertex indices starting and ending
+        at the depot (vertex 0).
+    """
+    if not starts:
+        return []
+    padded = _chase_routes(
+        np.asarray(succ, dtype=np.int64),
+        np.asarray(sorted(starts), dtype=np.int64),
+        n_vertices + 2,
+    )
+    return [[int(v) for v in row if v >= 0] for row in padded]
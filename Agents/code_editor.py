@@ -6,9 +6,278 @@ An agent that can analyze, modify, and generate Python code for OR problems.
 import re
 import ast
 import json
+import functools
 from typing import Optional
 
 
+@functools.lru_cache(maxsize=256)
+def _parse_code(code: str) -> ast.Module:
+    """
+    Parse code into an AST, memoized by source string.
+
+    The agent loop often analyzes, modifies, and re-analyzes the same
+    snippet within a single turn; caching the parsed tree means each
+    distinct source string is parsed only once.
+    """
+    return ast.parse(code)
+
+
+@functools.lru_cache(maxsize=128)
+def _param_pattern(param_name: str) -> re.Pattern:
+    """Compiled assignment pattern for a parameter name, cached across calls."""
+    return re.compile(rf'({re.escape(param_name)}\s*=\s*)([^\n]+)')
+
+
+# Compiled once at import; used as the regex fallback when code does not
+# parse. One alternation with a capture group per category lets a single
+# scan of the source feed both counters.
+_FALLBACK_COUNT_RE = re.compile(r'(LpVariable|add_var)|(model\s*\+=)')
+
+
+# Objective-sense tokens, matched on word boundaries so identifiers like
+# "minimized_cost" are left alone; one sub() call rewrites all of them
+_SENSE_RE = re.compile(r'\b(LpMinimize|LpMaximize|minimize|maximize)\b')
+_SENSE_MAP = {
+    "minimize": {"LpMaximize": "LpMinimize", "maximize": "minimize",
+                 "LpMinimize": "LpMinimize", "minimize": "minimize"},
+    "maximize": {"LpMinimize": "LpMaximize", "minimize": "maximize",
+                 "LpMaximize": "LpMaximize", "maximize": "maximize"},
+}
+
+
+def _count_fallback(code: str) -> tuple:
+    """Count variable declarations and constraints in one regex pass."""
+    n_vars = n_constraints = 0
+    for match in _FALLBACK_COUNT_RE.finditer(code):
+        if match.group(1):
+            n_vars += 1
+        else:
+            n_constraints += 1
+    return n_vars, n_constraints
+
+
+class _ModelVisitor(ast.NodeVisitor):
+    """
+    Single-pass collector of optimization-model structure.
+
+    Gathers imports, function names, variable declarations (LpVariable /
+    add_var calls), named constraints (`model += expr, "name"`), the
+    objective sense, and call/constraint counts in one AST traversal,
+    replacing the previous per-pattern regex scans over the source.
+    """
+
+    def __init__(self):
+        self.imports = []
+        self.functions = []
+        self.variables = []
+        self.constraints = []
+        self.objective = None
+        self.model_name = None
+        self.var_calls = 0
+        self.constraint_count = 0
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append(alias.name)
+
+    def visit_ImportFrom(self, node):
+        self.imports.append(f"{node.module}")
+
+    def visit_FunctionDef(self, node):
+        self.functions.append(node.name)
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if node.id == "LpMinimize":
+            self.objective = self.objective or "minimize"
+        elif node.id == "LpMaximize":
+            self.objective = self.objective or "maximize"
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Name):
+            name = func.id
+        elif isinstance(func, ast.Attribute):
+            name = func.attr
+        else:
+            name = None
+
+        if name in ("LpVariable", "add_var"):
+            self.var_calls += 1
+            var_name = None
+            if node.args and isinstance(node.args[0], ast.Constant) \
+                    and isinstance(node.args[0].value, str):
+                var_name = node.args[0].value
+            else:
+                for kw in node.keywords:
+                    if kw.arg == "name" and isinstance(kw.value, ast.Constant):
+                        var_name = kw.value.value
+                        break
+            if var_name is not None:
+                self.variables.append(var_name)
+
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        # Remember which name holds the LpProblem, so += on ordinary
+        # accumulators is not mistaken for a constraint below
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+                and isinstance(node.value, ast.Call):
+            func = node.value.func
+            func_name = func.id if isinstance(func, ast.Name) else \
+                func.attr if isinstance(func, ast.Attribute) else None
+            if func_name == "LpProblem":
+                self.model_name = self.model_name or node.targets[0].id
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        # Only `<model> += ...` is a constraint (or the objective); the
+        # baseline regex matched `model\s*\+=`, and counting every
+        # ast.Add AugAssign swept up plain accumulators like `total += i`
+        if isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name) \
+                and node.target.id == (self.model_name or "model"):
+            self.constraint_count += 1
+            value = node.value
+            if isinstance(value, ast.Tuple) and value.elts \
+                    and isinstance(value.elts[-1], ast.Constant) \
+                    and isinstance(value.elts[-1].value, str):
+                self.constraints.append(value.elts[-1].value)
+        self.generic_visit(node)
+
+
+def _scan_model(code: str, tree: Optional[ast.Module] = None) -> _ModelVisitor:
+    """
+    Run the fused model visitor over the code's (cached) AST.
+
+    When no explicit tree is passed, the finished visitor is memoized by
+    source string, so analyze-then-extract sequences on the same snippet
+    traverse the AST once. Callers must treat the result as read-only.
+    """
+    if tree is None:
+        if not code.strip():
+            # Blank snippets are common while the agent drafts code;
+            # skip the parse + traversal entirely
+            return _ModelVisitor()
+        return _scan_model_cached(code)
+    visitor = _ModelVisitor()
+    visitor.visit(tree)
+    return visitor
+
+
+@functools.lru_cache(maxsize=128)
+def _scan_model_cached(code: str) -> _ModelVisitor:
+    return _scan_model(code, _parse_code(code))
+
+
+# Problem templates, defined once at import; generate_template is a dict lookup
+_TEMPLATES = {
+    "TSP": '''"""
+Traveling Salesman Problem (TSP) - MTZ Formulation
+"""
+from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, LpContinuous, lpSum, PULP_CBC_CMD
+
+def solve_tsp(n, cost_matrix):
+    model = LpProblem("TSP", LpMinimize)
+    
+    # Variables
+    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary)
+         for i in range(n) for j in range(n) if i != j}
+    u = {i: LpVariable(f"u_{i}", lowBound=0, upBound=n-1, cat=LpContinuous)
+         for i in range(1, n)}
+    
+    # Objective
+    model += lpSum(cost_matrix[i][j] * x[i, j] for i in range(n) for j in range(n) if i != j)
+    
+    # Each city visited once
+    for j in range(n):
+        model += lpSum(x[i, j] for i in range(n) if i != j) == 1
+    for i in range(n):
+        model += lpSum(x[i, j] for j in range(n) if i != j) == 1
+    
+    # MTZ subtour elimination
+    for i in range(1, n):
+        for j in range(1, n):
+            if i != j:
+                model += u[i] - u[j] + n * x[i, j] <= n - 1
+    
+    model.solve(PULP_CBC_CMD(msg=0))
+    return model
+''',
+    "VRP": '''"""
+Vehicle Routing Problem (VRP) - Basic Formulation
+"""
+from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, lpSum, PULP_CBC_CMD
+
+def solve_vrp(n, K, cost_matrix, demands, capacity):
+    model = LpProblem("VRP", LpMinimize)
+    
+    # Variables
+    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary)
+         for i in range(n) for j in range(n) if i != j}
+    
+    # Objective
+    model += lpSum(cost_matrix[i][j] * x[i, j] for i in range(n) for j in range(n) if i != j)
+    
+    # Visit each customer once
+    for j in range(1, n):
+        model += lpSum(x[i, j] for i in range(n) if i != j) == 1
+    for i in range(1, n):
+        model += lpSum(x[i, j] for j in range(n) if i != j) == 1
+    
+    # Vehicle limit at depot
+    model += lpSum(x[0, j] for j in range(1, n)) <= K
+    
+    model.solve(PULP_CBC_CMD(msg=0))
+    return model
+''',
+    "VRPTW": '''"""
+VRP with Time Windows (VRPTW) - MTZ Formulation
+"""
+from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, LpContinuous, lpSum, PULP_CBC_CMD
+
+def solve_vrptw(n, K, cost_matrix, time_windows, service_times, demands, capacity):
+    model = LpProblem("VRPTW", LpMinimize)
+    M = 10000  # Big-M
+    
+    # Variables
+    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary)
+         for i in range(n) for j in range(n) if i != j}
+    t = {i: LpVariable(f"t_{i}", lowBound=time_windows[i][0], upBound=time_windows[i][1])
+         for i in range(n)}
+    
+    # Objective
+    model += lpSum(cost_matrix[i][j] * x[i, j] for i in range(n) for j in range(n) if i != j)
+    
+    # Constraints (add your constraints here)
+    # ...
+    
+    model.solve(PULP_CBC_CMD(msg=0))
+    return model
+''',
+    "KNAPSACK": '''"""
+0-1 Knapsack Problem
+"""
+from pulp import LpProblem, LpMaximize, LpVariable, LpBinary, lpSum, PULP_CBC_CMD
+
+def solve_knapsack(values, weights, capacity):
+    n = len(values)
+    model = LpProblem("Knapsack", LpMaximize)
+    
+    # Variables
+    x = {i: LpVariable(f"x_{i}", cat=LpBinary) for i in range(n)}
+    
+    # Objective: maximize value
+    model += lpSum(values[i] * x[i] for i in range(n))
+    
+    # Capacity constraint
+    model += lpSum(weights[i] * x[i] for i in range(n)) <= capacity
+    
+    model.solve(PULP_CBC_CMD(msg=0))
+    return model
+''',
+}
+
+
 class CodeEditorAgent:
     """Agent for editing and analyzing Python code related to OR problems."""
     
@@ -23,13 +292,15 @@ class CodeEditorAgent:
             "generate_template"
         ]
     
-    def analyze_code(self, code: str) -> dict:
+    def analyze_code(self, code: str, tree: Optional[ast.Module] = None) -> dict:
         """
         Analyze Python code and extract information about the optimization model.
-        
+
         Args:
             code: Python source code as string
-            
+            tree: Optional pre-parsed AST of the code. If not provided,
+                the code is parsed (with caching) on demand.
+
         Returns:
             Dictionary with analysis results
         """
@@ -43,44 +314,29 @@ class CodeEditorAgent:
             "errors": []
         }
         
-        # Check syntax
+        # Single fused AST pass (reusing the cached tree when available)
         try:
-            tree = ast.parse(code)
+            visitor = _scan_model(code, tree)
         except SyntaxError as e:
             analysis["syntax_valid"] = False
             analysis["errors"].append(f"Syntax error at line {e.lineno}: {e.msg}")
             return analysis
-        
-        # Extract imports
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    analysis["imports"].append(alias.name)
-            elif isinstance(node, ast.ImportFrom):
-                analysis["imports"].append(f"{node.module}")
-            elif isinstance(node, ast.FunctionDef):
-                analysis["functions"].append(node.name)
-        
-        # Pattern matching for PuLP/MIP variables
-        var_patterns = [
-            r'LpVariable\s*\(\s*["\'](\w+)["\']',  # PuLP
-            r'model\.add_var\s*\([^)]*name\s*=\s*["\'](\w+)["\']',  # python-mip
-        ]
-        
-        for pattern in var_patterns:
-            matches = re.findall(pattern, code)
-            analysis["variables"].extend(matches)
-        
-        # Pattern matching for constraints
-        constraint_pattern = r'model\s*\+=.*,\s*["\'](\w+)["\']'
-        analysis["constraints"] = re.findall(constraint_pattern, code)
-        
-        # Check for objective
-        if "LpMinimize" in code or "minimize" in code.lower():
-            analysis["objective"] = "minimize"
-        elif "LpMaximize" in code or "maximize" in code.lower():
-            analysis["objective"] = "maximize"
-        
+
+        analysis["imports"] = visitor.imports
+        analysis["functions"] = visitor.functions
+        analysis["variables"] = visitor.variables
+        analysis["constraints"] = visitor.constraints
+        analysis["objective"] = visitor.objective
+
+        # Fall back to a substring check when the sense is only mentioned
+        # in comments/strings rather than as an LpMinimize/LpMaximize name
+        if analysis["objective"] is None:
+            lowered = code.lower()
+            if "minimize" in lowered:
+                analysis["objective"] = "minimize"
+            elif "maximize" in lowered:
+                analysis["objective"] = "maximize"
+
         return analysis
     
     def modify_parameters(self, code: str, param_name: str, new_value: str) -> str:
@@ -95,13 +351,13 @@ class CodeEditorAgent:
         Returns:
             Modified code
         """
-        # Pattern to find parameter assignments
-        pattern = rf'({param_name}\s*=\s*)([^\n]+)'
-        
+        # Pattern to find parameter assignments (compiled once per name)
+        pattern = _param_pattern(param_name)
+
         def replacer(match):
             return f"{match.group(1)}{new_value}"
-        
-        modified_code = re.sub(pattern, replacer, code)
+
+        modified_code = pattern.sub(replacer, code)
         return modified_code
     
     def add_constraint(self, code: str, constraint_code: str, constraint_name: str) -> str:
@@ -168,14 +424,9 @@ class CodeEditorAgent:
         Returns:
             Modified code
         """
-        if new_sense.lower() == "minimize":
-            code = code.replace("LpMaximize", "LpMinimize")
-            code = code.replace("maximize", "minimize")
-        else:
-            code = code.replace("LpMinimize", "LpMaximize")
-            code = code.replace("minimize", "maximize")
-        
-        return code
+        sense = "minimize" if new_sense.lower() == "minimize" else "maximize"
+        mapping = _SENSE_MAP[sense]
+        return _SENSE_RE.sub(lambda m: mapping[m.group(0)], code)
     
     def extract_model_info(self, code: str) -> dict:
         """
@@ -213,9 +464,15 @@ class CodeEditorAgent:
         elif "python-mip" in code or "from mip" in code:
             info["solver"] = "python-mip (CBC)"
         
-        # Count variables and constraints
-        info["num_variables_approx"] = len(re.findall(r'LpVariable|add_var', code))
-        info["num_constraints_approx"] = len(re.findall(r'model\s*\+=', code))
+        # Count variables and constraints from the shared AST scan,
+        # falling back to regex counting for unparseable code
+        try:
+            visitor = _scan_model(code)
+            info["num_variables_approx"] = visitor.var_calls
+            info["num_constraints_approx"] = visitor.constraint_count
+        except SyntaxError:
+            info["num_variables_approx"], info["num_constraints_approx"] = \
+                _count_fallback(code)
         
         # Check for features
         if "timeLimit" in code or "max_seconds" in code:
@@ -235,126 +492,9 @@ class CodeEditorAgent:
         Returns:
             Code template as string
         """
-        templates = {
-            "TSP": self._tsp_template(),
-            "VRP": self._vrp_template(),
-            "VRPTW": self._vrptw_template(),
-            "KNAPSACK": self._knapsack_template()
-        }
-        
-        return templates.get(problem_type.upper(), "# Unknown problem type")
-    
-    def _tsp_template(self) -> str:
-        return '''"""
-Traveling Salesman Problem (TSP) - MTZ Formulation
-"""
-from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, LpContinuous, lpSum, PULP_CBC_CMD
-
-def solve_tsp(n, cost_matrix):
-    model = LpProblem("TSP", LpMinimize)
-    
-    # Variables
-    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary)
-         for i in range(n) for j in range(n) if i != j}
-    u = {i: LpVariable(f"u_{i}", lowBound=0, upBound=n-1, cat=LpContinuous)
-         for i in range(1, n)}
-    
-    # Objective
-    model += lpSum(cost_matrix[i][j] * x[i, j] for i in range(n) for j in range(n) if i != j)
-    
-    # Each city visited once
-    for j in range(n):
-        model += lpSum(x[i, j] for i in range(n) if i != j) == 1
-    for i in range(n):
-        model += lpSum(x[i, j] for j in range(n) if i != j) == 1
-    
-    # MTZ subtour elimination
-    for i in range(1, n):
-        for j in range(1, n):
-            if i != j:
-                model += u[i] - u[j] + n * x[i, j] <= n - 1
-    
-    model.solve(PULP_CBC_CMD(msg=0))
-    return model
-'''
-    
-    def _vrp_template(self) -> str:
-        return '''"""
-Vehicle Routing Problem (VRP) - Basic Formulation
-"""
-from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, lpSum, PULP_CBC_CMD
-
-def solve_vrp(n, K, cost_matrix, demands, capacity):
-    model = LpProblem("VRP", LpMinimize)
-    
-    # Variables
-    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary)
-         for i in range(n) for j in range(n) if i != j}
-    
-    # Objective
-    model += lpSum(cost_matrix[i][j] * x[i, j] for i in range(n) for j in range(n) if i != j)
-    
-    # Visit each customer once
-    for j in range(1, n):
-        model += lpSum(x[i, j] for i in range(n) if i != j) == 1
-    for i in range(1, n):
-        model += lpSum(x[i, j] for j in range(n) if i != j) == 1
+        return _TEMPLATES.get(problem_type.upper(), "# Unknown problem type")
     
-    # Vehicle limit at depot
-    model += lpSum(x[0, j] for j in range(1, n)) <= K
-    
-    model.solve(PULP_CBC_CMD(msg=0))
-    return model
-'''
-    
-    def _vrptw_template(self) -> str:
-        return '''"""
-VRP with Time Windows (VRPTW) - MTZ Formulation
-"""
-from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, LpContinuous, lpSum, PULP_CBC_CMD
-
-def solve_vrptw(n, K, cost_matrix, time_windows, service_times, demands, capacity):
-    model = LpProblem("VRPTW", LpMinimize)
-    M = 10000  # Big-M
     
-    # Variables
-    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary)
-         for i in range(n) for j in range(n) if i != j}
-    t = {i: LpVariable(f"t_{i}", lowBound=time_windows[i][0], upBound=time_windows[i][1])
-         for i in range(n)}
-    
-    # Objective
-    model += lpSum(cost_matrix[i][j] * x[i, j] for i in range(n) for j in range(n) if i != j)
-    
-    # Constraints (add your constraints here)
-    # ...
-    
-    model.solve(PULP_CBC_CMD(msg=0))
-    return model
-'''
-    
-    def _knapsack_template(self) -> str:
-        return '''"""
-0-1 Knapsack Problem
-"""
-from pulp import LpProblem, LpMaximize, LpVariable, LpBinary, lpSum, PULP_CBC_CMD
-
-def solve_knapsack(values, weights, capacity):
-    n = len(values)
-    model = LpProblem("Knapsack", LpMaximize)
-    
-    # Variables
-    x = {i: LpVariable(f"x_{i}", cat=LpBinary) for i in range(n)}
-    
-    # Objective: maximize value
-    model += lpSum(values[i] * x[i] for i in range(n))
-    
-    # Capacity constraint
-    model += lpSum(weights[i] * x[i] for i in range(n)) <= capacity
-    
-    model.solve(PULP_CBC_CMD(msg=0))
-    return model
-'''
     
     def process_request(self, request: dict) -> dict:
         """
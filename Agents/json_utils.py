@@ -0,0 +1,79 @@
+"""
+JSON helpers for the OR agents.
+Uses orjson (C extension, ~5-10x faster on nested numeric lists such as
+cost matrices) when available, then ujson (C encoder, still ~3x over
+stdlib), falling back to the stdlib json module. The tier is picked
+once at import so the per-call paths carry no conditionals.
+"""
+
+import functools
+import json
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ujson
+    HAS_UJSON = True
+except ImportError:
+    HAS_UJSON = False
+
+
+if HAS_ORJSON:
+    def dumps(obj, indent: bool = True) -> str:
+        """Serialize obj to a JSON string (pretty-printed by default)."""
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode()
+
+    def dumps_bytes(obj, indent: bool = True) -> bytes:
+        """Serialize obj to JSON bytes, ready for Path.write_bytes."""
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    def loads(s):
+        """Parse a JSON string (or bytes) into Python objects."""
+        return orjson.loads(s)
+elif HAS_UJSON:
+    def dumps(obj, indent: bool = True) -> str:
+        """Serialize obj to a JSON string (pretty-printed by default)."""
+        return ujson.dumps(obj, indent=2 if indent else 0)
+
+    def dumps_bytes(obj, indent: bool = True) -> bytes:
+        """Serialize obj to JSON bytes, ready for Path.write_bytes."""
+        return dumps(obj, indent).encode()
+
+    def loads(s):
+        """Parse a JSON string (or bytes) into Python objects."""
+        return ujson.loads(s)
+else:
+    def dumps(obj, indent: bool = True) -> str:
+        """Serialize obj to a JSON string (pretty-printed by default)."""
+        return json.dumps(obj, indent=2 if indent else None)
+
+    def dumps_bytes(obj, indent: bool = True) -> bytes:
+        """Serialize obj to JSON bytes, ready for Path.write_bytes."""
+        return dumps(obj, indent).encode()
+
+    def loads(s):
+        """Parse a JSON string (or bytes) into Python objects."""
+        return json.loads(s)
+
+
+@functools.lru_cache(maxsize=32)
+def loads_cached(s: str):
+    """
+    Parse a JSON string with memoization.
+
+    Chained agent tool calls (summary -> visualize -> gantt) typically
+    receive the exact same instance/solution JSON string; the cache
+    turns the repeat parses into dict lookups. Callers must treat the
+    result as read-only and copy before mutating.
+    """
+    return loads(s)
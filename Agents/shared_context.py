@@ -4,10 +4,50 @@ Provides per-user context isolation for multi-tenant deployments.
 """
 
 from typing import Optional, Dict, Any
-import json
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from itertools import islice
+import numpy as np
 from pathlib import Path
 import threading
 
+from Agents import json_utils
+
+
+@dataclass(slots=True, frozen=True)
+class InstanceMeta:
+    """
+    Scalar metadata of the current instance, extracted once when the
+    instance is stored. Status/history reads hit C-level slot accesses
+    instead of re-hashing dict keys on every call.
+    """
+    n_customers: Any
+    n_vehicles: Any
+    vehicle_capacity: Any
+
+    @classmethod
+    def from_instance(cls, instance: Dict[str, Any]) -> "InstanceMeta":
+        return cls(
+            n_customers=instance.get('n_customers', '?'),
+            n_vehicles=instance.get('n_vehicles', '?'),
+            vehicle_capacity=instance.get('vehicle_capacity', '?'),
+        )
+
+
+# Workspace directories already created by this process. mkdir with
+# exist_ok costs a stat per call and runs on every context init and
+# session start; steady-state requests skip the syscall entirely.
+_ensured_dirs: set = set()
+
+
+def _ensure_dir(path: Path):
+    """Create path once per process; later calls are a set lookup."""
+    key = str(path)
+    if key not in _ensured_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(key)
+
 
 class ORContext:
     """
@@ -26,15 +66,29 @@ class ORContext:
         """
         self.user_id = user_id
         self._current_instance: Optional[Dict[str, Any]] = None
+        self._coords_np: Optional[np.ndarray] = None
+        self._cost_np: Optional[np.ndarray] = None
+        self._demands_np: Optional[np.ndarray] = None
+        self._instance_json: Optional[str] = None
+        self._instance_json_compact: Optional[str] = None
+        self._meta: Optional[InstanceMeta] = None
+        # Set by the solver tools once the guardrail has accepted the
+        # current instance, so chained tool calls skip re-validation
+        self.instance_validated: bool = False
         self._current_solution: Optional[Dict[str, Any]] = None
-        self._history: list = []
+        # (key, report, solution) of the last solve; lets the solver
+        # tools replay identical re-solves without re-running CBC
+        self._solve_cache: Optional[tuple] = None
+        # Bounded so long-lived sessions can't grow the event log
+        # without limit; old events age out FIFO
+        self._history: deque = deque(maxlen=1000)
         self._workspace_path: Path = Path(base_workspace) / user_id
-        self._workspace_path.mkdir(parents=True, exist_ok=True)
+        _ensure_dir(self._workspace_path)
     
     def set_workspace(self, path: str):
         """Set the workspace path for file operations."""
         self._workspace_path = Path(path)
-        self._workspace_path.mkdir(parents=True, exist_ok=True)
+        _ensure_dir(self._workspace_path)
     
     @property
     def workspace(self) -> Path:
@@ -44,6 +98,9 @@ class ORContext:
     def set_instance(self, instance: Dict[str, Any], name: str = "default"):
         """Store the current VRP instance."""
         self._current_instance = instance
+        self._invalidate_np_caches()
+        self._meta = InstanceMeta.from_instance(instance)
+        self.instance_validated = False
         self._history.append({
             "type": "instance_created",
             "name": name,
@@ -55,14 +112,86 @@ class ORContext:
         return self._current_instance
     
     def get_instance_json(self) -> str:
-        """Get the current instance as JSON string."""
+        """
+        Get the current instance as JSON string.
+        Serialized once per instance and cached; the cache is dropped
+        alongside the NumPy views whenever the instance changes. The
+        fill is deliberately unlocked: concurrent callers may both
+        serialize, but they produce identical strings, so the race is
+        benign and the hot path stays lock-free.
+        """
         if self._current_instance is None:
             return '{"error": "No instance loaded. Please generate or load an instance first."}'
-        return json.dumps(self._current_instance, indent=2)
-    
+        if self._instance_json is None:
+            self._instance_json = json_utils.dumps(self._current_instance)
+        return self._instance_json
+
+    def get_instance_json_compact(self) -> str:
+        """
+        Get the current instance as compact JSON (no indentation).
+        This is the agent-facing form: the whitespace in the pretty
+        print is pure encode time and extra LLM tokens, so tools that
+        feed the instance back into the model should use this. Cached
+        like the pretty form.
+        """
+        if self._current_instance is None:
+            return '{"error": "No instance loaded. Please generate or load an instance first."}'
+        if self._instance_json_compact is None:
+            self._instance_json_compact = json_utils.dumps(
+                self._current_instance, indent=False
+            )
+        return self._instance_json_compact
+
+
     def has_instance(self) -> bool:
         """Check if an instance is loaded."""
         return self._current_instance is not None
+
+    def _invalidate_np_caches(self):
+        """Drop cached derived views (NumPy arrays, serialized JSON)."""
+        self._coords_np = None
+        self._cost_np = None
+        self._demands_np = None
+        self._instance_json = None
+        self._instance_json_compact = None
+
+    def get_coords_np(self) -> Optional[np.ndarray]:
+        """
+        Get the current instance's coordinates as a float32 NumPy array.
+        Converted lazily and cached so the visualizers share one buffer
+        instead of re-converting the JSON list-of-lists per call.
+        """
+        if self._current_instance is None:
+            return None
+        if self._coords_np is None:
+            self._coords_np = np.asarray(
+                self._current_instance['coordinates'], dtype=np.float32
+            )
+        return self._coords_np
+
+    def get_cost_np(self) -> Optional[np.ndarray]:
+        """
+        Get the current instance's cost matrix as a float32 NumPy array,
+        converted lazily and cached like the coordinate array so every
+        solve/report on the same instance reuses one buffer.
+        """
+        if self._current_instance is None:
+            return None
+        if self._cost_np is None:
+            self._cost_np = np.asarray(
+                self._current_instance['cost_matrix'], dtype=np.float32
+            )
+        return self._cost_np
+
+    def get_demands_np(self) -> Optional[np.ndarray]:
+        """Get the current instance's demands as a cached int32 array."""
+        if self._current_instance is None:
+            return None
+        if self._demands_np is None:
+            self._demands_np = np.asarray(
+                self._current_instance['demands'], dtype=np.int32
+            )
+        return self._demands_np
     
     # Solution Management
     def set_solution(self, solution: Dict[str, Any]):
@@ -89,8 +218,9 @@ class ORContext:
             return "Error: No instance to save."
         
         filepath = self._workspace_path / filename
-        with open(filepath, 'w') as f:
-            json.dump(self._current_instance, f, indent=2)
+        # One serialized payload, one write_bytes syscall -- no
+        # TextIOWrapper encode/flush in between
+        filepath.write_bytes(json_utils.dumps_bytes(self._current_instance))
         return f"Instance saved to {filepath}"
     
     def load_instance(self, filename: str = "vrp_instance.json") -> str:
@@ -100,8 +230,10 @@ class ORContext:
         if not filepath.exists():
             return f"Error: File {filepath} not found."
         
-        with open(filepath, 'r') as f:
-            self._current_instance = json.load(f)
+        self._current_instance = json_utils.loads(filepath.read_bytes())
+        self._invalidate_np_caches()
+        self._meta = InstanceMeta.from_instance(self._current_instance)
+        self.instance_validated = False
         return f"Instance loaded from {filepath}"
     
     # History and Status
@@ -115,10 +247,10 @@ class ORContext:
         status.append(f"Instance loaded: {'Yes' if self.has_instance() else 'No'}")
         
         if self.has_instance():
-            inst = self._current_instance
-            status.append(f"  - Customers: {inst.get('n_customers', '?')}")
-            status.append(f"  - Vehicles: {inst.get('n_vehicles', '?')}")
-            status.append(f"  - Capacity: {inst.get('vehicle_capacity', '?')}")
+            meta = self._meta
+            status.append(f"  - Customers: {meta.n_customers}")
+            status.append(f"  - Vehicles: {meta.n_vehicles}")
+            status.append(f"  - Capacity: {meta.vehicle_capacity}")
         
         status.append(f"Solution found: {'Yes' if self.has_solution() else 'No'}")
         
@@ -128,7 +260,9 @@ class ORContext:
             status.append(f"  - Routes: {len(sol.get('routes', []))}")
         
         status.append(f"\nHistory ({len(self._history)} events)")
-        for event in self._history[-5:]:  # Last 5 events
+        # Last 5 events; islice from the tail avoids copying the deque
+        n_events = len(self._history)
+        for event in islice(self._history, max(0, n_events - 5), n_events):
             status.append(f"  - {event['type']}")
         
         return "\n".join(status)
@@ -137,7 +271,11 @@ class ORContext:
         """Clear all context data."""
         self._current_instance = None
         self._current_solution = None
-        self._history = []
+        self._solve_cache = None
+        self._meta = None
+        self._invalidate_np_caches()
+        self.instance_validated = False
+        self._history.clear()
 
 
 class ORContextManager:
@@ -153,7 +291,7 @@ class ORContextManager:
     def set_base_workspace(cls, path: str):
         """Set the base workspace directory for all user contexts."""
         cls._base_workspace = path
-        Path(path).mkdir(parents=True, exist_ok=True)
+        _ensure_dir(Path(path))
     
     @classmethod
     def get_context(cls, user_id: str) -> ORContext:
@@ -167,10 +305,18 @@ class ORContextManager:
         Returns:
             ORContext instance for the user
         """
+        # Fast path: dict reads are atomic under the GIL, so an existing
+        # context is returned without taking the lock. Every tool call
+        # goes through here, and creation is the rare case.
+        ctx = cls._contexts.get(user_id)
+        if ctx is not None:
+            return ctx
         with cls._lock:
-            if user_id not in cls._contexts:
-                cls._contexts[user_id] = ORContext(user_id, cls._base_workspace)
-            return cls._contexts[user_id]
+            ctx = cls._contexts.get(user_id)
+            if ctx is None:
+                ctx = ORContext(user_id, cls._base_workspace)
+                cls._contexts[user_id] = ctx
+            return ctx
     
     @classmethod
     def clear_context(cls, user_id: str):
@@ -200,29 +346,34 @@ class ORContextManager:
             cls._contexts.clear()
 
 
-# Thread-local storage for current user context
-_current_user_id = threading.local()
+# Current user for the active request. A ContextVar rather than
+# threading.local: Chainlit handles all messages on one event-loop
+# thread, where thread-local state would leak between concurrent
+# coroutines. ContextVars are copied per task, so each request keeps
+# its own user, and the C-level get() is cheaper than the
+# attribute-miss path through getattr.
+_current_user_id: ContextVar[str] = ContextVar('or_user', default='anonymous')
 
 
 def set_current_user(user_id: str):
     """
-    Set the current user ID for the current thread.
+    Set the current user ID for the current task/thread.
     This should be called at the start of each request/message handling.
-    
+
     Args:
         user_id: Unique identifier for the user
     """
-    _current_user_id.value = user_id
+    _current_user_id.set(user_id)
 
 
 def get_current_user() -> str:
     """
-    Get the current user ID for the current thread.
-    
+    Get the current user ID for the current task/thread.
+
     Returns:
         User ID or 'anonymous' if not set
     """
-    return getattr(_current_user_id, 'value', 'anonymous')
+    return _current_user_id.get()
 
 
 def get_context(user_id: str = None) -> ORContext:
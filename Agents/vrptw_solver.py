@@ -4,25 +4,43 @@ Two-index formulation with Miller-Tucker-Zemlin subtour elimination constraints
 Using PuLP with COIN-OR CBC solver
 """
 
-import json
+import os
+import numpy as np
 from pulp import (
-    LpProblem, LpMinimize, LpVariable, LpBinary, LpContinuous,
-    lpSum, LpStatus, value, PULP_CBC_CMD
+    LpAffineExpression, LpProblem, LpMinimize, LpVariable, LpBinary,
+    LpContinuous, lpSum, LpStatus, value, PULP_CBC_CMD
 )
+from Agents import json_utils
+from Agents._route_build import reconstruct_routes
+from Agents.vrptw_heur import nearest_neighbor
 
 def load_instance(filename="vrp_instance.json"):
     """Load VRP instance from JSON file."""
-    with open(filename, 'r') as f:
-        return json.load(f)
+    with open(filename, 'rb') as f:
+        return json_utils.loads(f.read())
 
-def solve_vrptw_mtz(instance):
+def solve_vrptw_mtz(instance, time_limit=300, threads=None, mip_gap=None,
+                    lifted=True, warm_start=True):
     """
     Solve VRPTW using two-index MTZ formulation with PuLP + CBC.
-    
+
     Decision variables:
     - x[i][j]: 1 if arc (i,j) is used, 0 otherwise
     - t[i]: arrival time at vertex i
-    - u[i]: position of vertex i in the route (for MTZ subtour elimination)
+    - u[i]: MTZ ordering variable. With the lifted formulation u[i] is the
+      cumulative load after visiting i; otherwise it is the route position.
+
+    Args:
+        instance: VRP instance dictionary
+        time_limit: Maximum solving time in seconds
+        threads: CBC worker threads (defaults to all available cores)
+        mip_gap: Optional relative MIP gap for early termination (e.g. 0.01)
+        lifted: Use the Kara-Laporte-Bektas capacity-lifted MTZ constraints,
+            which give a tighter LP relaxation and subsume the separate
+            load-propagation constraints. Set False for the classic MTZ.
+        warm_start: Seed CBC with a nearest-neighbor incumbent so pruning
+            starts from a finite bound. Skipped automatically when the
+            heuristic cannot build a feasible start.
     """
     n = instance['n_vertices']
     K = instance['n_vehicles']
@@ -32,72 +50,142 @@ def solve_vrptw_mtz(instance):
     s = instance['service_times']
     d = instance['demands']
     
-    # Big-M for time constraints
-    M = max(tw[i][1] for i in range(n)) + max(c[i][j] for i in range(n) for j in range(n)) + max(s)
+    # Big-M for time constraints: vectorized C-level reductions instead
+    # of Python generators over the n^2 cost entries
+    c_arr = np.asarray(c)
+    tw_arr = np.asarray(tw)
+    M = float(tw_arr[:, 1].max() + c_arr.max() + np.max(s))
     
     # Create model
     model = LpProblem("VRPTW_MTZ", LpMinimize)
-    
+
+    # Arc sets, computed once. Every constraint family below otherwise
+    # re-walks the full n^2 grid evaluating the i != j filter; with the
+    # lists prepared up front the loops and lpSum calls receive exactly
+    # the arcs they need.
+    arcs = [(i, j) for i in range(n) for j in range(n) if i != j]
+    to_customer_arcs = [(i, j) for (i, j) in arcs if j != 0]
+    customer_arcs = [(i, j) for (i, j) in to_customer_arcs if i != 0]
+    out_arcs = [[j for j in range(n) if j != i] for i in range(n)]
+    in_arcs = [[i for i in range(n) if i != j] for j in range(n)]
+
     # Decision variables
     # x[i][j] = 1 if we travel from i to j
-    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary)
-         for i in range(n) for j in range(n) if i != j}
+    x = {(i, j): LpVariable(f"x_{i}_{j}", cat=LpBinary) for (i, j) in arcs}
     
     # t[i] = arrival time at vertex i
     t = {i: LpVariable(f"t_{i}", lowBound=tw[i][0], upBound=tw[i][1], cat=LpContinuous)
          for i in range(n)}
     
-    # u[i] = position in route (MTZ variable) for subtour elimination
-    u = {i: LpVariable(f"u_{i}", lowBound=0, upBound=n, cat=LpContinuous)
-         for i in range(n)}
-    
-    # load[i] = cumulative load when arriving at vertex i
-    load = {i: LpVariable(f"load_{i}", lowBound=0, upBound=Q, cat=LpContinuous)
-            for i in range(n)}
-    
+    if lifted:
+        # u[i] = cumulative load after visiting i (doubles as the MTZ
+        # ordering variable in the lifted formulation)
+        u = {i: LpVariable(f"u_{i}", lowBound=d[i], upBound=Q, cat=LpContinuous)
+             for i in range(n)}
+    else:
+        # u[i] = position in route (MTZ variable) for subtour elimination
+        u = {i: LpVariable(f"u_{i}", lowBound=0, upBound=n, cat=LpContinuous)
+             for i in range(n)}
+
+        # load[i] = cumulative load when arriving at vertex i
+        load = {i: LpVariable(f"load_{i}", lowBound=0, upBound=Q, cat=LpContinuous)
+                for i in range(n)}
+
     # Objective: minimize total travel cost
-    model += lpSum(c[i][j] * x[i, j] for i in range(n) for j in range(n) if i != j)
-    
+    model += lpSum(c[i][j] * x[i, j] for (i, j) in arcs)
+
     # Constraints
-    
+
     # 1. Each customer is visited exactly once
     for j in range(1, n):
-        model += lpSum(x[i, j] for i in range(n) if i != j) == 1, f"visit_in_{j}"
-    
+        model += lpSum(x[i, j] for i in in_arcs[j]) == 1, f"visit_in_{j}"
+
     # 2. Each customer is left exactly once
     for i in range(1, n):
-        model += lpSum(x[i, j] for j in range(n) if i != j) == 1, f"visit_out_{i}"
+        model += lpSum(x[i, j] for j in out_arcs[i]) == 1, f"visit_out_{i}"
     
     # 3. Flow conservation at depot
     model += lpSum(x[0, j] for j in range(1, n)) <= K, "depot_out"
     model += lpSum(x[i, 0] for i in range(1, n)) <= K, "depot_in"
     model += lpSum(x[0, j] for j in range(1, n)) == lpSum(x[i, 0] for i in range(1, n)), "depot_balance"
     
-    # 4. Time window constraints with travel time
-    for i in range(n):
-        for j in range(1, n):
-            if i != j:
-                model += t[j] >= t[i] + s[i] + c[i][j] - M * (1 - x[i, j]), f"time_{i}_{j}"
-    
-    # 5. MTZ subtour elimination constraints
-    for i in range(1, n):
-        for j in range(1, n):
-            if i != j:
-                model += u[i] - u[j] + n * x[i, j] <= n - 1, f"mtz_{i}_{j}"
-    
-    # 6. Capacity constraints
-    model += load[0] == 0, "load_depot"
-    
-    for i in range(n):
-        for j in range(1, n):
-            if i != j:
-                model += load[j] >= load[i] + d[j] - Q * (1 - x[i, j]), f"load_{i}_{j}"
+    # The n^2-sized constraint families below build each expression in
+    # one LpAffineExpression allocation from (variable, coefficient)
+    # pairs. Writing them as arithmetic (t[j] - t[i] - M*x[i,j] >= ...)
+    # allocates a fresh intermediate expression per operator, which is
+    # pure GC pressure during model build.
+
+    # 4. Time window constraints with travel time:
+    #    t[j] >= t[i] + s[i] + c[i][j] - M * (1 - x[i,j])
+    for i, j in to_customer_arcs:
+        model += LpAffineExpression(
+            [(t[j], 1), (t[i], -1), (x[i, j], -M)]
+        ) >= s[i] + c[i][j] - M, f"time_{i}_{j}"
+
+    if lifted:
+        # 5+6. Lifted MTZ constraints (Kara, Laporte, Bektas): eliminate
+        # subtours and enforce vehicle capacity in a single family:
+        #    u[i] - u[j] + Q*x[i,j] + (Q - d[i] - d[j])*x[j,i] <= Q - d[j]
+        for i, j in customer_arcs:
+            model += LpAffineExpression(
+                [(u[i], 1), (u[j], -1), (x[i, j], Q), (x[j, i], Q - d[i] - d[j])]
+            ) <= Q - d[j], f"lmtz_{i}_{j}"
+    else:
+        # 5. MTZ subtour elimination constraints:
+        #    u[i] - u[j] + n*x[i,j] <= n - 1
+        for i, j in customer_arcs:
+            model += LpAffineExpression(
+                [(u[i], 1), (u[j], -1), (x[i, j], n)]
+            ) <= n - 1, f"mtz_{i}_{j}"
+
+        # 6. Capacity constraints:
+        #    load[j] >= load[i] + d[j] - Q * (1 - x[i,j])
+        model += load[0] == 0, "load_depot"
+
+        for i, j in to_customer_arcs:
+            model += LpAffineExpression(
+                [(load[j], 1), (load[i], -1), (x[i, j], -Q)]
+            ) >= d[j] - Q, f"load_{i}_{j}"
     
+    # Warm start: hand CBC a nearest-neighbor incumbent as a MIP start
+    use_warm = False
+    if warm_start:
+        warm_routes, warm_arrivals = nearest_neighbor(instance)
+        if warm_routes and len(warm_routes) <= K:
+            use_warm = True
+            for var in x.values():
+                var.setInitialValue(0)
+            u[0].setInitialValue(0)
+            if not lifted:
+                load[0].setInitialValue(0)
+            for i in range(n):
+                t[i].setInitialValue(min(max(warm_arrivals[i], tw[i][0]), tw[i][1]))
+            for route in warm_routes:
+                cum_load = 0
+                for pos in range(1, len(route)):
+                    a, b = route[pos - 1], route[pos]
+                    x[a, b].setInitialValue(1)
+                    if b != 0:
+                        cum_load += d[b]
+                        if lifted:
+                            u[b].setInitialValue(cum_load)
+                        else:
+                            u[b].setInitialValue(pos)
+                            load[b].setInitialValue(cum_load)
+
     # Solve with CBC
     print("Solving VRPTW with MTZ formulation using PuLP + CBC...")
     print(f"Variables: {len(model.variables())}, Constraints: {len(model.constraints)}")
-    
-    solver = PULP_CBC_CMD(msg=1, timeLimit=300)
+
+    # msg=0: CBC progress chatter otherwise lands on stdout, where the
+    # Chainlit capture path turns every log line into streaming churn
+    solver = PULP_CBC_CMD(
+        msg=0,
+        timeLimit=time_limit,
+        threads=threads if threads is not None else os.cpu_count(),
+        gapRel=mip_gap,
+        warmStart=use_warm,
+    )
     status = model.solve(solver)
     
     return model, x, t, u, status
@@ -105,64 +193,58 @@ def solve_vrptw_mtz(instance):
 def extract_solution(model, x, t, instance, status):
     """Extract and print the solution."""
     n = instance['n_vertices']
-    
-    print("\n" + "=" * 50)
-    print("Solution")
-    print("=" * 50)
-    
+
+    # Accumulate the report and emit it with a single print at the end;
+    # per-line prints each pay a format + write, and the agent wrapper
+    # captures stdout wholesale anyway.
+    lines = ["\n" + "=" * 50, "Solution", "=" * 50]
+
     status_str = LpStatus[status]
-    print(f"Status: {status_str}")
-    
+    lines.append(f"Status: {status_str}")
+
     if status_str not in ["Optimal", "Feasible"]:
-        print("No feasible solution found!")
+        lines.append("No feasible solution found!")
+        print("\n".join(lines))
         return None
+
+    lines.append(f"Total Cost: {value(model.objective):.2f}")
     
-    print(f"Total Cost: {value(model.objective):.2f}")
-    
-    # Extract routes
-    routes = []
-    visited = set()
-    
-    for j in range(1, n):
-        if value(x[0, j]) > 0.5 and j not in visited:
-            route = [0, j]
-            visited.add(j)
-            current = j
-            
-            while current != 0:
-                for next_v in range(n):
-                    if current != next_v and value(x[current, next_v]) > 0.5:
-                        if next_v == 0:
-                            route.append(0)
-                            current = 0
-                        elif next_v not in visited:
-                            route.append(next_v)
-                            visited.add(next_v)
-                            current = next_v
-                        break
-            
-            routes.append(route)
+    # Extract routes: one pass over the arc variables builds the
+    # successor map (each customer has exactly one selected outgoing
+    # arc), then the shared kernel walks each route -- the same path
+    # the agent wrapper uses, no visited-set bookkeeping.
+    succ = [-1] * n
+    starts = []
+    for (i, j), var in x.items():
+        if var.varValue and var.varValue > 0.5:
+            if i == 0:
+                starts.append(j)
+            else:
+                succ[i] = j
+
+    routes = reconstruct_routes(succ, starts, n)
     
-    # Print routes
-    print(f"\nNumber of routes: {len(routes)}")
+    # Report routes
+    lines.append(f"\nNumber of routes: {len(routes)}")
     for idx, route in enumerate(routes):
         route_cost = sum(instance['cost_matrix'][route[i]][route[i+1]] for i in range(len(route)-1))
         route_demand = sum(instance['demands'][v] for v in route[1:-1])
-        
-        print(f"\nRoute {idx + 1}: {' -> '.join(map(str, route))}")
-        print(f"  Cost: {route_cost:.2f}")
-        print(f"  Total demand: {route_demand}")
-        print(f"  Stops: {len(route) - 2}")
-        
-        print("  Schedule:")
+
+        lines.append(f"\nRoute {idx + 1}: {' -> '.join(map(str, route))}")
+        lines.append(f"  Cost: {route_cost:.2f}")
+        lines.append(f"  Total demand: {route_demand}")
+        lines.append(f"  Stops: {len(route) - 2}")
+
+        lines.append("  Schedule:")
         for v in route:
             if v == 0:
-                print(f"    Depot")
+                lines.append("    Depot")
             else:
-                arrival = value(t[v]) if value(t[v]) is not None else 0
+                arrival = t[v].varValue or 0
                 tw = instance['time_windows'][v]
-                print(f"    Customer {v}: arrival={arrival:.1f}, TW=[{tw[0]}, {tw[1]}]")
-    
+                lines.append(f"    Customer {v}: arrival={arrival:.1f}, TW=[{tw[0]}, {tw[1]}]")
+
+    print("\n".join(lines))
     return routes
 
 def main():
@@ -1,3 +1,4 @@
+import functools
 import os
 import dotenv
 import httpx
@@ -16,18 +17,66 @@ timeout = httpx.Timeout(
     connect=60.0,   # Connection timeout (was causing the issue)
 )
 
-# Configure OpenAI Azure client with increased timeout
-azure = AsyncAzureOpenAI(
-    api_key=os.environ["AZURE_OPENAI_API_KEY"],
-    api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
-    azure_endpoint=os.environ[
-        "AZURE_OPENAI_ENDPOINT"
-    ],
-    timeout=timeout,
-)
-set_tracing_disabled(True)
-set_default_openai_client(azure)
 
-model = OpenAIChatCompletionsModel(
-    model=os.environ["AZURE_OPENAI_DEPLOYMENT"], openai_client=azure
-)
+@functools.cache
+def get_client() -> AsyncAzureOpenAI:
+    """
+    Build and register the Azure OpenAI client on first use.
+    functools.cache makes this a one-shot, thread-safe initializer, so
+    processes that never touch the LLM (batch solver runs, tooling)
+    skip the httpx connection-pool setup entirely.
+    """
+    client = AsyncAzureOpenAI(
+        api_key=os.environ["AZURE_OPENAI_API_KEY"],
+        api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
+        azure_endpoint=os.environ[
+            "AZURE_OPENAI_ENDPOINT"
+        ],
+        timeout=timeout,
+    )
+    set_tracing_disabled(True)
+    set_default_openai_client(client)
+    return client
+
+
+@functools.cache
+def get_model() -> OpenAIChatCompletionsModel:
+    """Main deployment used by the orchestrator and specialist agents."""
+    return OpenAIChatCompletionsModel(
+        model=os.environ["AZURE_OPENAI_DEPLOYMENT"], openai_client=get_client()
+    )
+
+
+@functools.cache
+def get_model_cheap() -> OpenAIChatCompletionsModel:
+    """
+    Smaller/faster deployment for lightweight classification work such
+    as the guardrail checkers. Falls back to the main deployment when
+    no mini deployment is configured.
+    """
+    return OpenAIChatCompletionsModel(
+        model=os.environ.get(
+            "AZURE_OPENAI_DEPLOYMENT_MINI", os.environ["AZURE_OPENAI_DEPLOYMENT"]
+        ),
+        openai_client=get_client(),
+    )
+
+
+_LAZY_ATTRS = {
+    "azure": get_client,
+    "model": get_model,
+    "model_cheap": get_model_cheap,
+}
+
+
+def __getattr__(name):
+    # PEP 562 module attribute hook: `from azure import model` keeps
+    # working, but the client is only constructed when something
+    # actually pulls one of these names. The factory is looked up
+    # before it is called so its own exceptions (e.g. a KeyError from
+    # a missing AZURE_OPENAI_* env var) propagate untouched instead of
+    # being rewritten as a bogus AttributeError.
+    factory = _LAZY_ATTRS.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return factory()
@@ -24,7 +24,7 @@ from Agents.shared_context import (
 )
 
 # Import guardrails
-from Agents.guardrails import topic_guardrail, safety_guardrail, professional_output_guardrail
+from Agents.guardrails import combined_input_guardrail, professional_output_guardrail
 
 import chainlit as cl
 
@@ -58,7 +58,7 @@ Always provide clear explanations and guide users through the OR workflow.
 Be helpful in explaining optimization concepts like time windows, capacity constraints, and routing.""",
     handoffs=[instance_generator_agent, vrptw_solver_agent, code_editor_agent, visualization_agent],
     model=model,
-    input_guardrails=[safety_guardrail, topic_guardrail],
+    input_guardrails=[combined_input_guardrail],
     output_guardrails=[professional_output_guardrail]
 )
 
@@ -181,10 +181,12 @@ async def on_message(message: cl.Message):
     
     except InputGuardrailTripwireTriggered as e:
         # Handle input guardrail violations
-        guardrail_name = e.guardrail_result.guardrail.name
         output_info = e.guardrail_result.output.output_info
-        
-        if guardrail_name == "topic_guardrail":
+
+        # The combined guardrail reports whichever check tripped:
+        # a TopicCheckResult for off-topic input, a SafetyCheckResult
+        # for unsafe input
+        if hasattr(output_info, "is_on_topic"):
             response = (
                 "🚫 **Off-topic request detected**\n\n"
                 "I'm specialized in Operations Research problems like:\n"
@@ -195,7 +197,7 @@ async def on_message(message: cl.Message):
                 f"*Reason: {output_info.reasoning}*\n\n"
                 "Please ask me about OR-related topics!"
             )
-        elif guardrail_name == "safety_guardrail":
+        elif hasattr(output_info, "is_safe"):
             response = (
                 "⚠️ **Request blocked for safety reasons**\n\n"
                 "I detected content that I cannot process. "